@@ -64,9 +64,10 @@ async def recv(proc, timeout: float = 5.0) -> dict:
 
 async def recv_response(proc, timeout: float = 10.0) -> dict:
     """读取响应，跳过服务端通知（没有 id 的消息）。"""
-    deadline = asyncio.get_event_loop().time() + timeout
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
     while True:
-        remaining = deadline - asyncio.get_event_loop().time()
+        remaining = deadline - loop.time()
         if remaining <= 0:
             raise TimeoutError("等待响应超时")
         msg = await recv(proc, timeout=remaining)
@@ -1,14 +1,21 @@
 """CLI entry point for qq-agent-mcp."""
 
 import argparse
+import functools
 import logging
 import sys
 
 from .config import Config
-from .server import run_server
 
 
-def parse_args() -> Config:
+def _id_set(value: str) -> frozenset[str] | None:
+    """Parse a comma-separated ID list. Empty means no filter (monitor all)."""
+    ids = frozenset(sys.intern(s) for s in value.split(",") if s)
+    return ids or None
+
+
+@functools.lru_cache(maxsize=1)
+def _get_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         prog="qq-agent-mcp",
         description="MCP Server for QQ via NapCatQQ (OneBot v11)",
@@ -33,11 +40,13 @@ def parse_args() -> Config:
     )
     parser.add_argument(
         "--groups",
+        type=_id_set,
         default=None,
         help="Comma-separated group IDs to monitor (default: all)",
     )
     parser.add_argument(
         "--friends",
+        type=_id_set,
         default=None,
         help="Comma-separated friend QQ IDs to monitor private chats (default: all)",
     )
@@ -60,23 +69,19 @@ def parse_args() -> Config:
         help="Log level (default: info)",
     )
 
-    args = parser.parse_args()
+    return parser
 
-    groups: set[str] | None = None
-    if args.groups:
-        groups = set(args.groups.split(","))
 
-    friends: set[str] | None = None
-    if args.friends:
-        friends = set(args.friends.split(","))
+def parse_args() -> Config:
+    args = _get_parser().parse_args()
 
     return Config(
         qq=args.qq,
         napcat_host=args.napcat_host,
         napcat_port=args.napcat_port,
         ws_port=args.ws_port,
-        groups=groups,
-        friends=friends,
+        groups=args.groups,
+        friends=args.friends,
         buffer_size=args.buffer_size,
         compress_every=args.compress_every,
         log_level=args.log_level,
@@ -92,6 +97,9 @@ def main() -> None:
         stream=sys.stderr,
     )
 
+    # Imported late so --help and argument errors skip loading mcp/aiohttp
+    from .server import run_server
+
     run_server(config)
 
 
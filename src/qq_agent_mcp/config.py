@@ -3,14 +3,14 @@
 from dataclasses import dataclass, field
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Config:
     qq: str
     napcat_host: str = "127.0.0.1"
     napcat_port: int = 3000
     ws_port: int = 3001
-    groups: set[str] | None = None  # None = monitor all groups
-    friends: set[str] | None = None  # None = monitor all private chats
+    groups: frozenset[str] | None = None  # None = monitor all groups
+    friends: frozenset[str] | None = None  # None = monitor all private chats
     buffer_size: int = 100
     compress_every: int = 30
     log_level: str = "info"
@@ -1,15 +1,27 @@
 """Message buffer & WebSocket listener for QQ message context."""
 
 import asyncio
+import functools
 import json
 import logging
+import random
+import re
+import sys
 import time
+import zlib
 from collections import deque
+from collections.abc import Awaitable, Callable
 from dataclasses import dataclass, field
 from datetime import datetime, timezone, timedelta
+from itertools import chain, islice, takewhile
 
 import aiohttp
 
+try:
+    from orjson import loads as _json_loads  # optional: faster JSON decoding
+except ImportError:
+    _json_loads = json.loads
+
 from .config import Config
 
 logger = logging.getLogger(__name__)
@@ -18,9 +30,28 @@ logger = logging.getLogger(__name__)
 CST = timezone(timedelta(hours=8))
 
 
-@dataclass
+@functools.lru_cache(maxsize=1024)
+def _iso_from_unix(unix_ts: int) -> str:
+    """ISO 8601 string in CST for a positive Unix timestamp (memoized).
+
+    Busy groups and backfills produce many events within the same second.
+    """
+    return datetime.fromtimestamp(unix_ts, tz=CST).isoformat()
+
+
+@functools.lru_cache(maxsize=1024)
+def _short_from_unix(unix_ts: int) -> str:
+    """MM-DD HH:MM string in CST for a positive Unix timestamp (memoized)."""
+    return datetime.fromtimestamp(unix_ts, tz=CST).strftime("%m-%d %H:%M")
+
+
+@dataclass(slots=True)
 class Message:
-    """Standardized message format."""
+    """Standardized message format.
+
+    Instances may be recycled by MessageBuffer (see `acquire`), so callers
+    must not hold on to a Message after it has been evicted from a buffer.
+    """
 
     sender_id: str
     sender_name: str
@@ -31,53 +62,149 @@ class Message:
     is_self: bool = False
     image_urls: list[str] = field(default_factory=list)
     received_at: float = field(default_factory=time.time)  # local monotonic clock
+    _dict_cache: dict | None = field(default=None, init=False, repr=False, compare=False)
 
     def to_dict(self) -> dict:
-        d = {
-            "sender_id": self.sender_id,
-            "sender_name": self.sender_name,
-            "content": self.content,
-            "timestamp": self.timestamp,
-            "message_id": str(self.message_id),
-            "is_at_me": self.is_at_me,
-            "is_self": self.is_self,
-        }
-        if self.image_urls:
-            d["image_urls"] = self.image_urls
+        """Return the dict form, built once and reused until the slot is recycled."""
+        d = self._dict_cache
+        if d is None:
+            d = {
+                "sender_id": self.sender_id,
+                "sender_name": self.sender_name,
+                "content": self.content,
+                "timestamp": self.timestamp,
+                "message_id": self.message_id,  # always built as str
+                "is_at_me": self.is_at_me,
+                "is_self": self.is_self,
+            }
+            if self.image_urls:
+                d["image_urls"] = self.image_urls
+            self._dict_cache = d
         return d
 
 
+# Max recycled Message instances kept per buffer
+_POOL_MAX = 16
+
+# Summary blocks of at least this many UTF-8 bytes are stored zlib-compressed
+_SUMMARY_COMPRESS_MIN = 512
+
+
 class MessageBuffer:
     """Per-target sliding window message buffer with compression."""
 
-    def __init__(self, maxlen: int = 100, compress_every: int = 30):
+    def __init__(
+        self,
+        maxlen: int = 100,
+        compress_every: int = 30,
+        index: dict[str, "Message"] | None = None,
+    ):
         self.messages: deque[Message] = deque(maxlen=maxlen)
+        # message_id -> Message for buffered messages; may be shared across buffers
+        self._index: dict[str, Message] = index if index is not None else {}
+        self._pool: list[Message] = []  # evicted instances free for reuse
         self._seen_ids: set[str] = set()  # for dedup by message_id
-        self.compressed_summary: str | None = None
+        # IDs in insertion order; the oldest falls out of _seen_ids when full
+        self._id_window: deque[str] = deque(maxlen=maxlen * 2)
+        self._summary_blocks: list[str | bytes] = []  # bytes = zlib-compressed
+        self._summary_len = 0  # chars in the joined summary
         self._msg_since_compress: int = 0
         self._compress_every = compress_every
         self._compress_pending = False
         self._compress_all_pending = False
 
+    def acquire(self, *args, **kwargs) -> Message:
+        """Build a Message, repopulating an evicted instance in place if one is free.
+
+        Takes the same arguments as the Message constructor.
+        """
+        if self._pool:
+            msg = self._pool.pop()
+            msg.__init__(*args, **kwargs)  # resets every field, incl. the dict cache
+            return msg
+        return Message(*args, **kwargs)
+
+    def _release(self, msg: Message) -> None:
+        """Return an instance that left the buffer to the free-list."""
+        if len(self._pool) < _POOL_MAX:
+            self._pool.append(msg)
+
     def add(self, msg: Message) -> None:
         """Add a message with dedup by message_id.
 
         Marks compression as pending when threshold is reached.
         """
-        if msg.message_id and msg.message_id in self._seen_ids:
-            return  # duplicate (e.g. direct write + WebSocket echo)
-        if msg.message_id:
-            self._seen_ids.add(msg.message_id)
-            # Prevent unbounded growth — trim oldest IDs when set is large
-            max_ids = (self.messages.maxlen or 100) * 2
-            if len(self._seen_ids) > max_ids:
-                self._seen_ids = {m.message_id for m in self.messages if m.message_id}
-        self.messages.append(msg)
+        mid = msg.message_id
+        if mid:
+            if mid in self._seen_ids:
+                self._release(msg)
+                return  # duplicate (e.g. direct write + WebSocket echo)
+            window = self._id_window
+            if len(window) == window.maxlen:
+                self._seen_ids.discard(window[0])
+            window.append(mid)
+            self._seen_ids.add(mid)
+
+        messages = self.messages
+        evicted = messages[0] if len(messages) == messages.maxlen else None
+        messages.append(msg)
+        if mid:
+            self._index[mid] = msg
+        if evicted is not None:
+            self._forget(evicted)
+            self._release(evicted)
+
         self._msg_since_compress += 1
 
         if self._msg_since_compress >= self._compress_every:
             self._compress_pending = True
 
+    def bulk_add(self, msgs: list[Message]) -> int:
+        """Add a batch (backfill) with dedup by message_id, in one extend.
+
+        Skips compression bookkeeping. Returns the number of messages added.
+        """
+        seen = self._seen_ids
+        window = self._id_window
+        fresh: list[Message] = []
+        for msg in msgs:
+            mid = msg.message_id
+            if mid:
+                if mid in seen:
+                    self._release(msg)
+                    continue
+                if len(window) == window.maxlen:
+                    seen.discard(window[0])
+                window.append(mid)
+                seen.add(mid)
+            fresh.append(msg)
+
+        messages = self.messages
+        excess = len(messages) + len(fresh) - messages.maxlen
+        evicted = list(islice(chain(messages, fresh), excess)) if excess > 0 else []
+        messages.extend(fresh)
+        self._index.update((m.message_id, m) for m in fresh if m.message_id)
+        for m in evicted:
+            self._forget(m)
+            self._release(m)
+        return len(fresh)
+
+    def _forget(self, msg: Message) -> None:
+        """Drop a message that left the buffer from the message_id index."""
+        if self._index.get(msg.message_id) is msg:
+            del self._index[msg.message_id]
+
+    def take_all(self) -> list[Message]:
+        """Remove and return every buffered message, resetting compression state."""
+        old_msgs = list(self.messages)
+        self.messages.clear()
+        for m in old_msgs:
+            self._forget(m)
+        self._compress_all_pending = False
+        self._compress_pending = False
+        self._msg_since_compress = 0
+        return old_msgs
+
     def mark_all_for_compress(self) -> None:
         """Mark all current messages for compression (used after backfill)."""
         if self.messages:
@@ -90,12 +217,7 @@ class MessageBuffer:
             if not self.messages:
                 self._compress_all_pending = False
                 return None
-            old_msgs = list(self.messages)
-            self.messages.clear()
-            self._compress_all_pending = False
-            self._compress_pending = False
-            self._msg_since_compress = 0
-            return old_msgs
+            return self.take_all()
 
         if not self._compress_pending:
             return None
@@ -110,31 +232,68 @@ class MessageBuffer:
             self._msg_since_compress = 0
             return None
 
-        old_msgs = []
-        for _ in range(n_to_compress):
-            old_msgs.append(self.messages.popleft())
+        popleft = self.messages.popleft
+        old_msgs = [popleft() for _ in range(n_to_compress)]
+        for m in old_msgs:
+            self._forget(m)
 
         self._compress_pending = False
         self._msg_since_compress = 0
         return old_msgs
 
     def apply_summary(self, new_summary: str) -> None:
-        """Append a compressed summary block."""
-        if self.compressed_summary:
-            self.compressed_summary = self.compressed_summary + "\n" + new_summary
-        else:
-            self.compressed_summary = new_summary
+        """Append a compressed summary block.
+
+        Large blocks are kept zlib-compressed and only inflated when the
+        summary is read, since long-running monitors accumulate many.
+        """
+        if not new_summary:
+            return
+        raw = new_summary.encode("utf-8")
+        block: str | bytes = new_summary
+        if len(raw) >= _SUMMARY_COMPRESS_MIN:
+            packed = zlib.compress(raw)
+            if len(packed) < len(raw):
+                block = packed
+        if self._summary_blocks:
+            self._summary_len += 1  # joining newline
+        self._summary_blocks.append(block)
+        self._summary_len += len(new_summary)
+
+        logger.debug("Summary updated. Length: %d", self._summary_len)
 
-        logger.debug("Summary updated. Length: %d", len(self.compressed_summary))
+    @property
+    def compressed_summary(self) -> str | None:
+        """All summary blocks joined by newlines, or None if nothing was compressed yet."""
+        if not self._summary_blocks:
+            return None
+        return "\n".join(
+            zlib.decompress(b).decode("utf-8") if isinstance(b, bytes) else b
+            for b in self._summary_blocks
+        )
 
     def get_recent(self, limit: int = 20) -> list[dict]:
-        """Return the most recent `limit` messages as dicts."""
-        msgs = list(self.messages)
-        return [m.to_dict() for m in msgs[-limit:]]
+        """Return the most recent `limit` messages as dicts (oldest first).
+
+        The dicts are cached on each Message and shared between calls, so
+        callers must treat them as read-only.
+        """
+        if limit <= 0:
+            return []
+        # Walk back from the tail so only `limit` entries are touched
+        recent = [m.to_dict() for m in islice(reversed(self.messages), limit)]
+        recent.reverse()
+        return recent
 
     def get_since(self, since: float) -> list[Message]:
-        """Return messages with received_at >= since."""
-        return [m for m in self.messages if m.received_at >= since]
+        """Return messages with received_at >= since, oldest first.
+
+        Messages are only ever appended, so walk back from the newest and
+        stop at the first older one instead of scanning the whole buffer.
+        """
+        tail = list(takewhile(lambda m: m.received_at >= since, reversed(self.messages)))
+        tail.reverse()
+        return tail
 
     @property
     def count(self) -> int:
@@ -145,6 +304,142 @@ class MessageBuffer:
 _FORWARD_MAX_DEPTH = 2
 _FORWARD_MAX_MESSAGES = 20
 
+# Max concurrent get_*_msg_history calls during backfill
+_BACKFILL_CONCURRENCY = 8
+
+# Max concurrent get_msg / get_forward_msg calls while parsing messages
+_PARSE_API_CONCURRENCY = 8
+
+# Max undecoded WS frames held while handlers catch up; oldest dropped beyond this
+_WS_PENDING_MAX = 1000
+
+# Only message events are handled; frames without this (heartbeats, meta,
+# notices) are dropped before JSON decoding. "message_sent" does not match.
+_MESSAGE_FRAME_RE = re.compile(r'"post_type"\s*:\s*"message"')
+_MESSAGE_FRAME_RE_B = re.compile(rb'"post_type"\s*:\s*"message"')
+
+
+# ── Segment handlers ───────────────────────────────────────
+# Dispatch tables for _parse_message_segments: segment type -> handler
+# returning the text to append. Unknown types are silently dropped.
+
+_EMPTY: dict = {}
+_NO_SEGMENTS: list = []  # shared "message" default; never mutated
+
+
+def _interned(value):
+    """sys.intern for str values; anything else is returned unchanged.
+
+    Sender IDs and names repeat across most buffered messages, so interning
+    keeps one copy of each per talker instead of one per message.
+    """
+    return sys.intern(value) if type(value) is str else value
+
+
+def _event_user_id(event: dict) -> str:
+    """Sender QQ of a message event, falling back to sender.user_id."""
+    return str(event.get("user_id") or (event.get("sender") or _EMPTY).get("user_id") or "")
+
+
+@dataclass(slots=True)
+class _ParseState:
+    """Mutable per-call state shared by the segment handlers."""
+
+    self_qq: str
+    depth: int
+    is_at_me: bool = False
+    image_urls: list[str] = field(default_factory=list)
+
+
+def _seg_text(data: dict, state: _ParseState) -> str:
+    return data.get("text", "")
+
+
+def _seg_at(data: dict, state: _ParseState) -> str:
+    qq = str(data.get("qq", ""))
+    if qq == state.self_qq or qq == "all":
+        state.is_at_me = True
+        return "@me"
+    name = data.get("name", qq)
+    return f"@{name}"
+
+
+def _seg_image(data: dict, state: _ParseState) -> str:
+    url = data.get("url", "")
+    if url:
+        state.image_urls.append(url)
+    return "[图片]"
+
+
+def _seg_face(data: dict, state: _ParseState) -> str:
+    face_id = data.get("id", "?")
+    return f"[表情{face_id}]"
+
+
+def _seg_record(data: dict, state: _ParseState) -> str:
+    return "[语音]"
+
+
+def _seg_video(data: dict, state: _ParseState) -> str:
+    return "[视频]"
+
+
+def _seg_json(data: dict, state: _ParseState) -> str:
+    raw = data.get("data", "")
+    if isinstance(raw, str) and '"prompt"' not in raw:
+        return "[卡片消息]"  # no prompt -> no label, whatever else the card holds
+    try:
+        card = _json_loads(raw) if isinstance(raw, str) else raw
+        prompt = (card.get("prompt") or "").strip()
+        desc = (card.get("desc") or "").strip()
+    except (ValueError, TypeError, AttributeError):  # ValueError: json / orjson decode error
+        return "[卡片消息]"
+    if prompt and desc:
+        label = f"{desc} - {prompt}"
+    elif prompt:
+        label = prompt
+    else:
+        return "[卡片消息]"
+    if len(label) > 80:
+        label = label[:80] + "…"
+    return f"[卡片: {label}]"
+
+
+def _seg_file(data: dict, state: _ParseState) -> str:
+    return f"[文件: {data.get('name', '?')}]"
+
+
+async def _seg_reply(ctx: "ContextManager", data: dict, state: _ParseState) -> str:
+    reply_id = data.get("id", "")
+    if not reply_id:
+        return "[回复了 未知消息] "
+    return await ctx._resolve_reply(reply_id, state.depth)
+
+
+async def _seg_forward(ctx: "ContextManager", data: dict, state: _ParseState) -> str:
+    return await ctx._expand_forward(data, state.depth)
+
+
+_SegHandler = Callable[[dict, _ParseState], str]
+_AsyncSegHandler = Callable[["ContextManager", dict, _ParseState], Awaitable[str]]
+
+_SEG_HANDLERS: dict[str, _SegHandler] = {
+    "text": _seg_text,
+    "at": _seg_at,
+    "image": _seg_image,
+    "face": _seg_face,
+    "record": _seg_record,
+    "video": _seg_video,
+    "json": _seg_json,
+    "file": _seg_file,
+}
+
+# Handlers that need the ContextManager and may hit the OneBot API
+_ASYNC_SEG_HANDLERS: dict[str, _AsyncSegHandler] = {
+    "reply": _seg_reply,
+    "forward": _seg_forward,
+}
+
 
 class ContextManager:
     """Manages message buffers and the WebSocket event listener."""
@@ -152,29 +447,61 @@ class ContextManager:
     def __init__(self, config: Config, bot=None):
         self.config = config
         self.bot = bot  # OneBotClient, set before start()
+        # Hot-path aliases (Config is frozen, so these never go stale)
+        self._self_qq = config.qq
+        # Whitelists as frozensets; None means monitor everything
+        self._monitored_groups = config.groups
+        self._monitored_friends = config.friends
         self._buffers: dict[str, MessageBuffer] = {}
+        self._msg_index: dict[str, Message] = {}  # message_id -> buffered Message
+        self._compress_locks: dict[str, asyncio.Lock] = {}  # buffer key -> compress guard
+        self._parse_api_sem = asyncio.Semaphore(_PARSE_API_CONCURRENCY)
+        # Buffers are never removed, so these only grow (see buffer_stats)
+        self._group_buffers = 0
+        self._friend_buffers = 0
         self._ws_task: asyncio.Task | None = None
+        self._ws_session: aiohttp.ClientSession | None = None  # reused across reconnects
         self._running = False
+        self._stop_event = asyncio.Event()  # set by stop(); ends reconnect waits early
+        # Raw WS frames handed from the reader (_ws_loop) to _process_loop
+        self._queue: asyncio.Queue[str | bytes] = asyncio.Queue(maxsize=_WS_PENDING_MAX)
+        self._worker_task: asyncio.Task | None = None
 
     def _buffer_key(self, target_type: str, target_id: str) -> str:
         return f"{target_type}:{target_id}"
 
+    def compress_lock(self, key: str) -> asyncio.Lock:
+        """Lock held for a whole compress run on one buffer (take, summarise, apply)."""
+        lock = self._compress_locks.get(key)
+        if lock is None:
+            lock = self._compress_locks[key] = asyncio.Lock()
+        return lock
+
     def _get_or_create_buffer(self, key: str) -> MessageBuffer:
-        if key not in self._buffers:
-            self._buffers[key] = MessageBuffer(
+        buf = self._buffers.get(key)
+        if buf is None:
+            buf = self._buffers[key] = MessageBuffer(
                 maxlen=self.config.buffer_size,
                 compress_every=self.config.compress_every,
+                index=self._msg_index,
             )
-        return self._buffers[key]
+            if key.startswith("group:"):
+                self._group_buffers += 1
+            elif key.startswith("private:"):
+                self._friend_buffers += 1
+        return buf
 
     # ── Public API ──────────────────────────────────────────
 
     def start(self) -> None:
-        """Start the background WebSocket listener task."""
+        """Start the background WebSocket reader and event worker tasks."""
         if self._ws_task is not None:
             return
         self._running = True
-        self._ws_task = asyncio.get_event_loop().create_task(self._ws_loop())
+        self._stop_event.clear()
+        loop = asyncio.get_running_loop()
+        self._worker_task = loop.create_task(self._process_loop())
+        self._ws_task = loop.create_task(self._ws_loop())
         logger.info("WebSocket listener started (target: %s)", self.config.ws_url)
 
     async def backfill_history(self, bot) -> None:
@@ -185,29 +512,36 @@ class ContextManager:
             logger.warning("Failed to get group list for backfill: %s", e)
             return
 
+        gids = [str(g.get("group_id", "")) for g in groups]
+        monitored = self._monitored_groups
+        if monitored is not None:
+            gids = [gid for gid in gids if gid in monitored]
+        histories = await self._fetch_histories(bot.get_group_msg_history, gids)
+
         count = 0
-        for g in groups:
-            gid = str(g.get("group_id", ""))
-            if not self.config.is_group_monitored(gid):
+        for gid, messages in zip(gids, histories):
+            if isinstance(messages, BaseException):
+                logger.warning("Failed to backfill group %s: %s", gid, messages)
                 continue
             try:
-                messages = await bot.get_group_msg_history(gid, count=self.config.buffer_size)
                 key = self._buffer_key("group", gid)
                 buf = self._get_or_create_buffer(key)
+                new_msgs: list[Message] = []
                 for event in messages:
-                    sender_id = str(event.get("user_id", event.get("sender", {}).get("user_id", "")))
-                    is_self = sender_id == self.config.qq
-                    content, is_at_me, image_urls = await self._parse_message_segments(event.get("message", []))
+                    sender = event.get("sender") or _EMPTY
+                    sender_id = str(event.get("user_id", sender.get("user_id", "")))
+                    is_self = sender_id == self._self_qq
+                    content, is_at_me, image_urls = await self._parse_message_segments(event.get("message", _NO_SEGMENTS))
                     if not content.strip():
                         continue
                     sender_name = (
-                        event.get("sender", {}).get("card")
-                        or event.get("sender", {}).get("nickname")
+                        sender.get("card")
+                        or sender.get("nickname")
                         or sender_id
                     )
                     msg = Message(
-                        sender_id=sender_id,
-                        sender_name=sender_name,
+                        sender_id=_interned(sender_id),
+                        sender_name=_interned(sender_name),
                         content=content,
                         timestamp=self._format_timestamp(event.get("time", 0)),
                         message_id=str(event.get("message_id", "")),
@@ -215,8 +549,8 @@ class ContextManager:
                         is_self=is_self,
                         image_urls=image_urls,
                     )
-                    buf.messages.append(msg)
-                    count += 1
+                    new_msgs.append(msg)
+                count += buf.bulk_add(new_msgs)
                 logger.info("Backfilled %d messages for group %s", len(buf.messages), gid)
             except Exception as e:
                 logger.warning("Failed to backfill group %s: %s", gid, e)
@@ -230,33 +564,39 @@ class ContextManager:
             logger.warning("Failed to get friend list for backfill: %s", e)
             return
 
+        uids = [str(f.get("user_id", "")) for f in all_friends]
+        monitored = self._monitored_friends
+        uids = [uid for uid in uids if uid and (monitored is None or uid in monitored)]
+        histories = await self._fetch_histories(bot.get_friend_msg_history, uids)
+
         friend_count = 0
-        for f in all_friends:
-            uid = str(f.get("user_id", ""))
-            if not uid or not self.config.is_friend_monitored(uid):
+        for uid, messages in zip(uids, histories):
+            if isinstance(messages, BaseException):
+                logger.warning("Failed to backfill friend %s: %s", uid, messages)
                 continue
             try:
-                messages = await bot.get_friend_msg_history(uid, count=self.config.buffer_size)
                 key = self._buffer_key("private", uid)
                 buf = self._get_or_create_buffer(key)
+                new_msgs: list[Message] = []
                 for event in messages:
-                    sender_id = str(event.get("user_id", event.get("sender", {}).get("user_id", "")))
-                    is_self = sender_id == self.config.qq
-                    content, _, image_urls = await self._parse_message_segments(event.get("message", []))
+                    sender = event.get("sender") or _EMPTY
+                    sender_id = str(event.get("user_id", sender.get("user_id", "")))
+                    is_self = sender_id == self._self_qq
+                    content, _, image_urls = await self._parse_message_segments(event.get("message", _NO_SEGMENTS))
                     if not content.strip():
                         continue
-                    sender_name = event.get("sender", {}).get("nickname", sender_id)
+                    sender_name = sender.get("nickname", sender_id)
                     msg = Message(
-                        sender_id=sender_id,
-                        sender_name=sender_name,
+                        sender_id=_interned(sender_id),
+                        sender_name=_interned(sender_name),
                         content=content,
                         timestamp=self._format_timestamp(event.get("time", 0)),
                         message_id=str(event.get("message_id", "")),
                         is_self=is_self,
                         image_urls=image_urls,
                     )
-                    buf.messages.append(msg)
-                    friend_count += 1
+                    new_msgs.append(msg)
+                friend_count += buf.bulk_add(new_msgs)
                 logger.info("Backfilled %d messages for friend %s", len(buf.messages), uid)
             except Exception as e:
                 logger.warning("Failed to backfill friend %s: %s", uid, e)
@@ -264,9 +604,27 @@ class ContextManager:
         logger.info("Friend history backfill complete: %d messages across friends",
                     friend_count)
 
+    async def _fetch_histories(self, fetch, target_ids: list[str]) -> list:
+        """Fetch message history for many targets concurrently.
+
+        Returns one entry per target ID, in order: the event list, or the
+        exception raised for that target.
+        """
+        sem = asyncio.Semaphore(_BACKFILL_CONCURRENCY)
+        count = self.config.buffer_size
+
+        async def guarded(target_id: str) -> list[dict]:
+            async with sem:
+                return await fetch(target_id, count=count)
+
+        return await asyncio.gather(
+            *(guarded(tid) for tid in target_ids), return_exceptions=True,
+        )
+
     async def stop(self) -> None:
         """Stop the WebSocket listener."""
         self._running = False
+        self._stop_event.set()
         if self._ws_task:
             self._ws_task.cancel()
             try:
@@ -274,6 +632,18 @@ class ContextManager:
             except asyncio.CancelledError:
                 pass
             self._ws_task = None
+        if self._ws_session:
+            await self._ws_session.close()
+            self._ws_session = None
+        if self._worker_task:
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+            self._worker_task = None
+        while not self._queue.empty():
+            self._queue.get_nowait()
         logger.info("WebSocket listener stopped")
 
     def get_context(
@@ -325,97 +695,140 @@ class ContextManager:
     def buffer_stats(self) -> dict:
         """Summary stats for check_status."""
         total = sum(b.count for b in self._buffers.values())
-        groups = sum(1 for k in self._buffers if k.startswith("group:"))
-        friends = sum(1 for k in self._buffers if k.startswith("private:"))
         return {
             "total_messages_buffered": total,
-            "groups_tracked": groups,
-            "friends_tracked": friends,
+            "groups_tracked": self._group_buffers,
+            "friends_tracked": self._friend_buffers,
         }
 
     # ── WebSocket Loop ──────────────────────────────────────
 
     async def _ws_loop(self) -> None:
-        """Reconnecting WebSocket listener loop."""
+        """Reconnecting WebSocket listener loop.
+
+        Retry delays back off exponentially with +/-25% jitter so bots that
+        lost NapCat at the same moment do not reconnect in lockstep.
+        """
         retry_delay = 1.0  # seconds, grows on failure
         max_retry = 30.0
 
         while self._running:
             try:
-                async with aiohttp.ClientSession() as session:
-                    logger.info("Connecting to WebSocket: %s", self.config.ws_url)
-                    async with session.ws_connect(self.config.ws_url) as ws:
-                        logger.info("WebSocket connected")
-                        retry_delay = 1.0  # reset on success
-                        async for raw_msg in ws:
-                            if raw_msg.type == aiohttp.WSMsgType.TEXT:
-                                try:
-                                    event = json.loads(raw_msg.data)
-                                    await self._handle_event(event)
-                                except json.JSONDecodeError:
-                                    logger.warning("Invalid JSON from WS: %s", raw_msg.data[:200])
-                            elif raw_msg.type == aiohttp.WSMsgType.ERROR:
-                                logger.error("WS error: %s", ws.exception())
-                                break
-                            elif raw_msg.type in (
-                                aiohttp.WSMsgType.CLOSE,
-                                aiohttp.WSMsgType.CLOSING,
-                                aiohttp.WSMsgType.CLOSED,
-                            ):
-                                logger.warning("WS connection closed")
-                                break
+                if self._ws_session is None or self._ws_session.closed:
+                    self._ws_session = aiohttp.ClientSession()
+                logger.info("Connecting to WebSocket: %s", self.config.ws_url)
+                async with self._ws_session.ws_connect(self.config.ws_url) as ws:
+                    logger.info("WebSocket connected")
+                    retry_delay = 1.0  # reset on success
+                    async for raw_msg in ws:
+                        if raw_msg.type in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                            self._enqueue_frame(raw_msg.data)
+                        elif raw_msg.type == aiohttp.WSMsgType.ERROR:
+                            logger.error("WS error: %s", ws.exception())
+                            break
+                        elif raw_msg.type in (
+                            aiohttp.WSMsgType.CLOSE,
+                            aiohttp.WSMsgType.CLOSING,
+                            aiohttp.WSMsgType.CLOSED,
+                        ):
+                            logger.warning("WS connection closed")
+                            break
             except asyncio.CancelledError:
                 raise
             except Exception as e:
                 logger.error("WebSocket connection error: %s", e)
 
             if self._running:
-                logger.info("Reconnecting in %.1fs...", retry_delay)
-                await asyncio.sleep(retry_delay)
+                delay = retry_delay * random.uniform(0.75, 1.25)
+                logger.info("Reconnecting in %.1fs...", delay)
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+                    break  # stop() was called
+                except asyncio.TimeoutError:
+                    pass
                 retry_delay = min(retry_delay * 2, max_retry)
 
+    def _enqueue_frame(self, raw: str | bytes) -> None:
+        """Hand a raw WS frame to the worker, dropping the oldest if backlogged.
+
+        Frames that cannot be message events are discarded undecoded.
+        """
+        pattern = _MESSAGE_FRAME_RE_B if isinstance(raw, bytes) else _MESSAGE_FRAME_RE
+        if pattern.search(raw) is None:
+            return
+        queue = self._queue
+        if queue.full():
+            queue.get_nowait()
+            logger.warning("WS backlog full (%d frames), dropping oldest", queue.maxsize)
+        queue.put_nowait(raw)
+
+    async def _process_loop(self) -> None:
+        """Decode and handle queued WS frames until cancelled.
+
+        Runs apart from the reader so slow handlers (reply/forward API
+        lookups) never stall socket reads. Queue.get does not suspend
+        while frames are queued, so a burst is drained in one pass.
+        """
+        queue = self._queue
+        loads = _json_loads
+        handle = self._handle_event
+        while True:
+            raw = await queue.get()
+            try:
+                event = loads(raw)
+            except ValueError:  # json / orjson JSONDecodeError
+                logger.warning("Invalid JSON from WS: %s", raw[:200])
+                continue
+            try:
+                await handle(event)
+            except Exception as e:
+                logger.error("Failed to handle WS event: %s", e)
+
     # ── Event Handling ──────────────────────────────────────
 
     async def _handle_event(self, event: dict) -> None:
-        """Route an OneBot v11 event to the appropriate handler."""
-        post_type = event.get("post_type")
-        if post_type != "message":
+        """Route an OneBot v11 event to the appropriate handler.
+
+        Whitelist checks happen here, so unmonitored targets are dropped
+        before any segment parsing.
+        """
+        if event.get("post_type") != "message":
             return  # Only handle message events
 
         msg_type = event.get("message_type")
         if msg_type == "group":
-            await self._handle_group_message(event)
+            group_id = str(event.get("group_id", ""))
+            groups = self._monitored_groups
+            if groups is None or group_id in groups:
+                await self._handle_group_message(event, group_id)
         elif msg_type == "private":
-            await self._handle_private_message(event)
-
-    async def _handle_group_message(self, event: dict) -> None:
-        """Process a group message event."""
-        group_id = str(event.get("group_id", ""))
-        sender_id = str(event.get("user_id", event.get("sender", {}).get("user_id", "")))
-
-        # Whitelist check
-        if not self.config.is_group_monitored(group_id):
-            return
+            sender_id = _event_user_id(event)
+            # Accept all private messages when friends=None, or check whitelist
+            friends = self._monitored_friends
+            if friends is None or sender_id in friends:
+                await self._handle_private_message(event, sender_id)
 
-        is_self = sender_id == self.config.qq
+    async def _handle_group_message(self, event: dict, group_id: str) -> None:
+        """Process a group message event from a monitored group."""
+        sender_id = _event_user_id(event)
+        is_self = sender_id == self._self_qq
 
         # Parse message content and @detection
-        content, is_at_me, image_urls = await self._parse_message_segments(event.get("message", []))
+        content, is_at_me, image_urls = await self._parse_message_segments(event.get("message", _NO_SEGMENTS))
         if not content.strip():
             return  # Skip empty messages
 
-        sender_name = (
-            event.get("sender", {}).get("card")
-            or event.get("sender", {}).get("nickname")
-            or sender_id
-        )
+        sender = event.get("sender") or _EMPTY
+        sender_name = sender.get("card") or sender.get("nickname") or sender_id
 
         timestamp = self._format_timestamp(event.get("time", 0))
         message_id = str(event.get("message_id", ""))
 
-        msg = Message(
-            sender_id=sender_id,
-            sender_name=sender_name,
+        key = self._buffer_key("group", group_id)
+        buf = self._get_or_create_buffer(key)
+        msg = buf.acquire(
+            sender_id=_interned(sender_id),
+            sender_name=_interned(sender_name),
             content=content,
             timestamp=timestamp,
             message_id=message_id,
@@ -423,9 +836,6 @@ class ContextManager:
             is_self=is_self,
             image_urls=image_urls,
         )
-
-        key = self._buffer_key("group", group_id)
-        buf = self._get_or_create_buffer(key)
         buf.add(msg)
 
         logger.debug(
@@ -436,36 +846,29 @@ class ContextManager:
             " [@me]" if is_at_me else "",
         )
 
-    async def _handle_private_message(self, event: dict) -> None:
-        """Process a private message event."""
-        sender_id = str(event.get("user_id", event.get("sender", {}).get("user_id", "")))
-
-        # Accept all private messages when friends=None, or check whitelist
-        if not self.config.is_friend_monitored(sender_id):
-            return
-
-        is_self = sender_id == self.config.qq
+    async def _handle_private_message(self, event: dict, sender_id: str) -> None:
+        """Process a private message event from a whitelisted friend."""
+        is_self = sender_id == self._self_qq
 
-        content, _, image_urls = await self._parse_message_segments(event.get("message", []))
+        content, _, image_urls = await self._parse_message_segments(event.get("message", _NO_SEGMENTS))
         if not content.strip():
             return
 
-        sender_name = event.get("sender", {}).get("nickname", sender_id)
+        sender_name = (event.get("sender") or _EMPTY).get("nickname", sender_id)
         timestamp = self._format_timestamp(event.get("time", 0))
         message_id = str(event.get("message_id", ""))
 
-        msg = Message(
-            sender_id=sender_id,
-            sender_name=sender_name,
+        key = self._buffer_key("private", sender_id)
+        buf = self._get_or_create_buffer(key)
+        msg = buf.acquire(
+            sender_id=_interned(sender_id),
+            sender_name=_interned(sender_name),
             content=content,
             timestamp=timestamp,
             message_id=message_id,
             is_self=is_self,
             image_urls=image_urls,
         )
-
-        key = self._buffer_key("private", sender_id)
-        buf = self._get_or_create_buffer(key)
         buf.add(msg)
 
         logger.debug("Private %s | %s: %s", sender_id, sender_name, content[:50])
@@ -473,12 +876,8 @@ class ContextManager:
     # ── Helpers ───────────────────────────────────────────
 
     def _find_message_in_buffers(self, message_id: str) -> Message | None:
-        """Search all buffers for a message by its message_id (O(n) scan, zero I/O)."""
-        for buf in self._buffers.values():
-            for msg in reversed(buf.messages):  # recent first
-                if msg.message_id == message_id:
-                    return msg
-        return None
+        """Look up a buffered message by its message_id (O(1), zero I/O)."""
+        return self._msg_index.get(message_id)
 
     async def _resolve_reply(
         self, reply_id: str, depth: int,
@@ -503,7 +902,8 @@ class ContextManager:
             return "[回复了 未知消息] "
 
         try:
-            event = await self.bot.get_msg(reply_id)
+            async with self._parse_api_sem:
+                event = await self.bot.get_msg(reply_id)
         except Exception as e:
             logger.warning("Failed to get_msg %s for reply expansion: %s", reply_id, e)
             return "[回复了 未知消息] "
@@ -512,12 +912,12 @@ class ContextManager:
             return "[回复了 未知消息] "
 
         # Parse sender
-        sender = event.get("sender", {})
+        sender = event.get("sender") or _EMPTY
         sender_name = sender.get("card") or sender.get("nickname") or str(sender.get("user_id", "?"))
         sender_id = str(event.get("user_id", sender.get("user_id", "?")))
 
         # Parse content (non-recursive for reply — depth+1 to avoid infinite loops)
-        raw_msg = event.get("message", [])
+        raw_msg = event.get("message", _NO_SEGMENTS)
         if isinstance(raw_msg, str):
             content_text = raw_msg
         else:
@@ -534,7 +934,7 @@ class ContextManager:
     # ── Message Parsing ─────────────────────────────────────
 
     async def _parse_message_segments(
-        self, segments: list, _depth: int = 0,
+        self, segments: list[dict] | str, _depth: int = 0,
     ) -> tuple[str, bool, list[str]]:
         """Parse OneBot v11 message segments into text content.
 
@@ -545,72 +945,43 @@ class ContextManager:
         if isinstance(segments, str):
             return segments, False, []
 
+        # Fast path: a lone text segment (most group chatter)
+        if len(segments) == 1 and segments[0].get("type") == "text":
+            text = (segments[0].get("data") or _EMPTY).get("text", "")
+            return text.strip(), False, []
+
+        # Fast path: @mention followed by text, no per-call parse state
+        if (
+            len(segments) == 2
+            and segments[0].get("type") == "at"
+            and segments[1].get("type") == "text"
+        ):
+            at_data = segments[0].get("data") or _EMPTY
+            text = (segments[1].get("data") or _EMPTY).get("text", "")
+            qq = str(at_data.get("qq", ""))
+            if qq == self._self_qq or qq == "all":
+                return f"@me{text}".strip(), True, []
+            return f"@{at_data.get('name', qq)}{text}".strip(), False, []
+
         parts: list[str] = []
-        is_at_me = False
-        image_urls: list[str] = []
+        state = _ParseState(self_qq=self._self_qq, depth=_depth)
+        handlers = _SEG_HANDLERS
+        async_handlers = _ASYNC_SEG_HANDLERS
 
         for seg in segments:
-            seg_type = seg.get("type", "")
-            data = seg.get("data", {})
-
-            if seg_type == "text":
-                parts.append(data.get("text", ""))
-            elif seg_type == "at":
-                qq = str(data.get("qq", ""))
-                if qq == self.config.qq or qq == "all":
-                    is_at_me = True
-                    parts.append("@me")
-                else:
-                    name = data.get("name", qq)
-                    parts.append(f"@{name}")
-            elif seg_type == "image":
-                url = data.get("url", "")
-                if url:
-                    image_urls.append(url)
-                parts.append("[图片]")
-            elif seg_type == "face":
-                face_id = data.get("id", "?")
-                parts.append(f"[表情{face_id}]")
-            elif seg_type == "reply":
-                reply_id = data.get("id", "")
-                if reply_id:
-                    reply_text = await self._resolve_reply(reply_id, _depth)
-                    parts.append(reply_text)
-                else:
-                    parts.append("[回复了 未知消息] ")
-            elif seg_type == "record":
-                parts.append("[语音]")
-            elif seg_type == "video":
-                parts.append("[视频]")
-            elif seg_type == "forward":
-                forward_text = await self._expand_forward(data, _depth)
-                parts.append(forward_text)
-            elif seg_type == "json":
-                raw = data.get("data", "")
-                try:
-                    card = json.loads(raw) if isinstance(raw, str) else raw
-                    prompt = (card.get("prompt") or "").strip()
-                    desc = (card.get("desc") or "").strip()
-                    if prompt and desc:
-                        label = f"{desc} - {prompt}"
-                    elif prompt:
-                        label = prompt
-                    else:
-                        label = None
-                    if label:
-                        if len(label) > 80:
-                            label = label[:80] + "…"
-                        parts.append(f"[卡片: {label}]")
-                    else:
-                        parts.append("[卡片消息]")
-                except (json.JSONDecodeError, TypeError, AttributeError):
-                    parts.append("[卡片消息]")
-            elif seg_type == "file":
-                parts.append(f"[文件: {data.get('name', '?')}]")
+            seg_type = seg.get("type")
+
+            handler = handlers.get(seg_type)
+            if handler is not None:
+                parts.append(handler(seg.get("data") or _EMPTY, state))
+                continue
+            async_handler = async_handlers.get(seg_type)
+            if async_handler is not None:
+                parts.append(await async_handler(self, seg.get("data") or _EMPTY, state))
             # Other types are silently dropped
 
         content = "".join(parts).strip()
-        return content, is_at_me, image_urls
+        return content, state.is_at_me, state.image_urls
 
     async def _expand_forward(self, data: dict, depth: int) -> str:
         """Expand a forward message into readable text.
@@ -634,7 +1005,8 @@ class ContextManager:
             return "[转发消息]"
 
         try:
-            nodes = await self.bot.get_forward_msg(forward_id)
+            async with self._parse_api_sem:
+                nodes = await self.bot.get_forward_msg(forward_id)
         except Exception as e:
             logger.warning("Failed to fetch forward msg %s: %s", forward_id, e)
             return "[转发消息]"
@@ -644,53 +1016,56 @@ class ContextManager:
 
         total = len(nodes)
         indent = "  " * (depth + 1)
-        lines: list[str] = []
-        count = 0
+        shown = nodes[:_FORWARD_MAX_MESSAGES]
 
-        for node in nodes:
-            if count >= _FORWARD_MAX_MESSAGES:
-                break
+        # Parse nodes concurrently so their reply / nested-forward lookups
+        # overlap instead of costing one OneBot round-trip each in turn
+        texts = await asyncio.gather(
+            *(self._forward_node_text(node, depth) for node in shown)
+        )
 
+        lines: list[str] = [f"(转发消息 共{total}条):"]
+        for node, text in zip(shown, texts):
             # Extract sender info
-            sender = node.get("sender", {})
+            sender = node.get("sender") or _EMPTY
             sender_name = sender.get("nickname", sender.get("card", "?"))
             sender_id = str(sender.get("user_id", "?"))
             ts = self._format_short_timestamp(node.get("time", 0))
-
-            # Parse nested content (may contain further forwards)
-            node_content = node.get("content", node.get("message", []))
-            if isinstance(node_content, list):
-                text, _, _ = await self._parse_message_segments(node_content, _depth=depth + 1)
-            elif isinstance(node_content, str):
-                text = node_content
-            else:
-                text = str(node_content)
-
-            # Truncate long content (single-line: 50 chars, with nested forward: 500 chars)
-            max_len = 500 if "\n" in text else 50
-            if len(text) > max_len:
-                text = text[:max_len] + "..."
-
             lines.append(f"{indent}[{ts}] {sender_name}({sender_id}): {text}")
-            count += 1
 
-        header = f"(转发消息 共{total}条):"
-        result = header + "\n" + "\n".join(lines)
         if total > _FORWARD_MAX_MESSAGES:
-            result += f"\n{indent}...省略{total - _FORWARD_MAX_MESSAGES}条"
-        return result
+            lines.append(f"{indent}...省略{total - _FORWARD_MAX_MESSAGES}条")
+        return "\n".join(lines)
+
+    async def _forward_node_text(self, node: dict, depth: int) -> str:
+        """Parse one forward node's content into (truncated) text."""
+        # Parse nested content (may contain further forwards)
+        node_content = node.get("content")
+        if node_content is None:
+            node_content = node.get("message", _NO_SEGMENTS)
+        if isinstance(node_content, list):
+            text, _, _ = await self._parse_message_segments(node_content, _depth=depth + 1)
+        elif isinstance(node_content, str):
+            text = node_content
+        else:
+            text = str(node_content)
+
+        # Truncate long content (single-line: 50 chars, with nested forward: 500 chars)
+        max_len = 500 if "\n" in text else 50
+        if len(text) > max_len:
+            text = text[:max_len] + "..."
+        return text
 
     @staticmethod
     def _format_short_timestamp(unix_ts: int) -> str:
         """Convert Unix timestamp to short MM-DD HH:MM format in CST."""
         if unix_ts <= 0:
             return "??-?? ??:??"
-        dt = datetime.fromtimestamp(unix_ts, tz=CST)
-        return dt.strftime("%m-%d %H:%M")
+        return _short_from_unix(unix_ts)
 
     @staticmethod
     def _format_timestamp(unix_ts: int) -> str:
         """Convert Unix timestamp to ISO 8601 string in CST."""
         if unix_ts <= 0:
             return datetime.now(CST).isoformat()
-        return datetime.fromtimestamp(unix_ts, tz=CST).isoformat()
+        return _iso_from_unix(unix_ts)
@@ -7,6 +7,11 @@ import aiohttp
 
 logger = logging.getLogger(__name__)
 
+# Pooled keep-alive connections to NapCat. The per-host cap covers backfill
+# and message-parsing fan-out (8 each) running at the same time.
+_POOL_LIMIT_PER_HOST = 16
+_KEEPALIVE_SECONDS = 60.0
+
 
 class OneBotError(Exception):
     """Raised when OneBot API returns a non-zero retcode."""
@@ -27,7 +32,11 @@ class OneBotClient:
 
     async def _ensure_session(self) -> aiohttp.ClientSession:
         if self._session is None:
-            self._session = aiohttp.ClientSession(timeout=self.timeout)
+            connector = aiohttp.TCPConnector(
+                limit_per_host=_POOL_LIMIT_PER_HOST,
+                keepalive_timeout=_KEEPALIVE_SECONDS,
+            )
+            self._session = aiohttp.ClientSession(timeout=self.timeout, connector=connector)
         return self._session
 
     async def close(self) -> None:
@@ -36,11 +45,20 @@ class OneBotClient:
             self._session = None
 
     async def _call(self, action: str, **params: Any) -> Any:
-        """Call an OneBot API action and return the data field."""
-        session = await self._ensure_session()
+        """Call an OneBot API action and return the data field.
 
-        url = f"{self.base_url}/{action}"
+        Params that are None are left out of the request.
+        """
         payload = {k: v for k, v in params.items() if v is not None}
+        return await self._call_raw(action, payload)
+
+    async def _call_raw(self, action: str, payload: dict[str, Any]) -> Any:
+        """Like _call, but posts `payload` as-is (no None filtering)."""
+        session = self._session
+        if session is None:
+            session = await self._ensure_session()
+
+        url = f"{self.base_url}/{action}"
 
         logger.debug("OneBot call: %s %s", action, payload)
 
@@ -67,7 +85,7 @@ class OneBotClient:
 
     async def get_group_info(self, group_id: str) -> dict:
         """Get info for a specific group."""
-        return await self._call("get_group_info", group_id=int(group_id))
+        return await self._call_raw("get_group_info", {"group_id": int(group_id)})
 
     async def get_friend_list(self) -> list[dict]:
         """Get friend list."""
@@ -87,8 +105,8 @@ class OneBotClient:
         if reply_to:
             segments.append({"type": "reply", "data": {"id": reply_to}})
         segments.extend(message)
-        return await self._call(
-            "send_group_msg", group_id=int(group_id), message=segments
+        return await self._call_raw(
+            "send_group_msg", {"group_id": int(group_id), "message": segments}
         )
 
     async def send_private_msg(
@@ -99,16 +117,16 @@ class OneBotClient:
         if reply_to:
             segments.append({"type": "reply", "data": {"id": reply_to}})
         segments.extend(message)
-        return await self._call(
-            "send_private_msg", user_id=int(user_id), message=segments
+        return await self._call_raw(
+            "send_private_msg", {"user_id": int(user_id), "message": segments}
         )
 
     async def get_group_msg_history(
         self, group_id: str, count: int = 20
     ) -> list[dict]:
         """Fetch recent group message history. Returns list of message events."""
-        data = await self._call(
-            "get_group_msg_history", group_id=int(group_id), count=count
+        data = await self._call_raw(
+            "get_group_msg_history", {"group_id": int(group_id), "count": count}
         )
         return data.get("messages", []) if data else []
 
@@ -119,8 +137,8 @@ class OneBotClient:
 
         Returns list of message events, same format as get_group_msg_history.
         """
-        data = await self._call(
-            "get_friend_msg_history", user_id=int(user_id), count=count
+        data = await self._call_raw(
+            "get_friend_msg_history", {"user_id": int(user_id), "count": count}
         )
         return data.get("messages", []) if data else []
 
@@ -129,12 +147,12 @@ class OneBotClient:
 
         Returns the full message event dict (sender, message, time, etc.).
         """
-        return await self._call("get_msg", message_id=int(message_id))
+        return await self._call_raw("get_msg", {"message_id": int(message_id)})
 
     async def get_forward_msg(self, id: str) -> list[dict]:
         """Fetch forwarded message content by forward ID.
 
         Returns a list of message nodes, each with sender info and content.
         """
-        data = await self._call("get_forward_msg", id=id)
+        data = await self._call_raw("get_forward_msg", {"id": id})
         return data.get("messages", data.get("message", [])) if data else []
@@ -2,8 +2,10 @@
 
 import asyncio
 import logging
+import random
 from contextlib import asynccontextmanager
 
+import anyio
 from mcp.server.fastmcp import FastMCP
 
 from .config import Config
@@ -14,13 +16,18 @@ from .tools import register_tools
 logger = logging.getLogger(__name__)
 
 MAX_READY_WAIT = 30  # seconds to wait for NapCat to be reachable
+# _wait_ready retry delay: uniform(0, min(cap, base * 2**attempt)) ("full jitter").
+# The 4s cap keeps the steady-state mean at the old fixed 2s poll.
+READY_BACKOFF_BASE = 0.1
+READY_BACKOFF_CAP = 4.0
 
 
 async def _wait_ready(bot: OneBotClient, timeout: float = MAX_READY_WAIT) -> bool:
     """Poll OneBot /get_login_info until reachable or timeout."""
-    deadline = asyncio.get_event_loop().time() + timeout
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
     attempt = 0
-    while asyncio.get_event_loop().time() < deadline:
+    while loop.time() < deadline:
         attempt += 1
         try:
             info = await bot.get_login_info()
@@ -31,7 +38,9 @@ async def _wait_ready(bot: OneBotClient, timeout: float = MAX_READY_WAIT) -> boo
             return True
         except Exception as e:
             logger.debug("wait_ready attempt %d: %s", attempt, e)
-            await asyncio.sleep(min(2.0, deadline - asyncio.get_event_loop().time()))
+            ceiling = min(READY_BACKOFF_CAP, READY_BACKOFF_BASE * 2 ** min(attempt, 6))
+            delay = random.uniform(0, ceiling)
+            await asyncio.sleep(min(delay, deadline - loop.time()))
     logger.warning("NapCat not reachable after %.0fs — starting anyway", timeout)
     return False
 
@@ -64,8 +73,23 @@ def create_server(config: Config) -> FastMCP:
     return mcp
 
 
+def _uvloop_available() -> bool:
+    """True when uvloop is installed (`fast` extra, not on Windows)."""
+    try:
+        import uvloop  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
 def run_server(config: Config) -> None:
     """Start the MCP Server with stdio transport (blocking)."""
     mcp = create_server(config)
-    logger.info("Starting MCP Server (QQ: %s, OneBot: %s)", config.qq, config.onebot_base_url)
-    mcp.run(transport="stdio")
+    use_uvloop = _uvloop_available()
+    logger.info(
+        "Starting MCP Server (QQ: %s, OneBot: %s, uvloop: %s)",
+        config.qq, config.onebot_base_url, use_uvloop,
+    )
+    # Same as mcp.run(transport="stdio"), but anyio builds the uvloop loop via a
+    # loop factory instead of asyncio.set_event_loop_policy (deprecated in 3.14)
+    anyio.run(mcp.run_stdio_async, backend_options={"use_uvloop": use_uvloop})
@@ -1,13 +1,15 @@
 """MCP Tools definitions."""
 
 import asyncio
+import functools
 import hashlib
 import logging
 import random
 import re
 import time
 import unicodedata
-from collections import deque
+from collections import OrderedDict, deque
+from collections.abc import Awaitable, Callable
 from datetime import datetime, timezone, timedelta
 from typing import Any
 
@@ -20,8 +22,6 @@ from .onebot import OneBotClient
 
 logger = logging.getLogger(__name__)
 
-# Rate limiter state: target -> last_send_timestamp
-_last_send: dict[str, float] = {}
 RATE_LIMIT_SECONDS = 3.0
 CST = timezone(timedelta(hours=8))
 
@@ -87,6 +87,58 @@ def _check_duplicate(target_key: str, content: str) -> str | None:
     history.append((h, now))
     return None
 
+
+# ── Per-target send rate limiting ───────────────────────
+class _TokenBucket:
+    """Async token bucket: acquire() waits for a token instead of failing.
+
+    Refill and take happen with no await in between, so they are atomic on
+    the event loop; waiters sleep without holding anything, and sends to
+    other targets are never serialized behind them.
+    """
+
+    def __init__(self, capacity: float = 1.0, rate: float = 1.0 / RATE_LIMIT_SECONDS):
+        self.capacity = capacity
+        self.rate = rate  # tokens per second
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    async def acquire(self) -> None:
+        """Take one token, sleeping until one is available."""
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def refund(self) -> None:
+        """Give back a token taken for a send that failed."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+# key = "target_type:target_id" -> bucket, least recently used first. Capped:
+# an evicted bucket has long since refilled, so recreating it is equivalent.
+_send_buckets: OrderedDict[str, _TokenBucket] = OrderedDict()
+_SEND_BUCKETS_MAX = 1024
+
+
+def _send_bucket(key: str) -> _TokenBucket:
+    bucket = _send_buckets.get(key)
+    if bucket is not None:
+        _send_buckets.move_to_end(key)
+        return bucket
+    bucket = _send_buckets[key] = _TokenBucket()
+    if len(_send_buckets) > _SEND_BUCKETS_MAX:
+        _send_buckets.popitem(last=False)
+    return bucket
+
 # Chunking config
 CHUNK_MAX_CHARS = 30
 # Delay: ms per character (scales with chunk length)
@@ -97,6 +149,86 @@ HUMAN_DELAY_MAX_MS = 3000
 # Server start time for uptime tracking
 _start_time: float = time.time()
 
+# Seconds to reuse group/friend lists and group info between tool calls
+_LIST_CACHE_TTL = 15.0
+
+
+class _TTLCache:
+    """Caches the result of an async zero-argument fetch for `ttl` seconds.
+
+    Single-flight: concurrent callers on an expired entry share one fetch.
+    Failures are not cached.
+    """
+
+    def __init__(self, fetch: Callable[[], Awaitable[Any]], ttl: float = _LIST_CACHE_TTL):
+        self._fetch = fetch
+        self._ttl = ttl
+        self._value: Any = None
+        self._expires = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> Any:
+        if time.monotonic() < self._expires:
+            return self._value
+        async with self._lock:
+            if time.monotonic() < self._expires:
+                return self._value  # refreshed while we waited
+            value = await self._fetch()
+            self._value = value
+            self._expires = time.monotonic() + self._ttl
+            return value
+
+    def invalidate(self) -> None:
+        self._expires = 0.0
+
+
+class _NameIndex:
+    """id -> display name lookup over a cached OneBot list.
+
+    Rebuilt only when the underlying _TTLCache hands back a new list, so
+    lookups between refetches are O(1) instead of a scan.
+    """
+
+    def __init__(self, source: _TTLCache, id_key: str, name: Callable[[dict], str]):
+        self._source = source
+        self._id_key = id_key
+        self._name = name
+        self._items: Any = None
+        self._map: dict[str, str] = {}
+
+    async def get(self) -> dict[str, str]:
+        items = await self._source.get()
+        if items is not self._items:
+            id_key, name = self._id_key, self._name
+            self._map = {str(i.get(id_key, "")): name(i) for i in items}
+            self._items = items
+        return self._map
+
+
+# ── _chunk_message patterns ─────────────────────────────
+# A "." that starts one of these (e.g. "a.md", "IMG.JPG") never ends a sentence
+_FILE_EXTENSIONS = (
+    "md", "jpeg", "jpg", "png", "py", "js", "ts", "json", "html", "css", "txt",
+    "csv", "pdf", "zip", "gif", "svg", "mp3", "mp4", "wav",
+)
+_PARA_SPLIT_RE = re.compile(r'\n\n+')
+# Level-1: sentence-enders (punctuation kept via lookbehind)
+# English period only splits when NOT preceded by a digit (avoids "1. item" or "v2.0")
+# and when the next characters are not a file extension (case-insensitive)
+_SENTENCE_RE = re.compile(
+    r'(?<=(?<!\d)[.])(?!(?i:' + '|'.join(_FILE_EXTENSIONS) + r')\b)'
+    r'|(?<=[!?。！？~\n])'
+)
+# ASCII text without a "." has no context to check: map the remaining enders to
+# a sentinel in one 1:1 translate pass and split on it
+_ASCII_SENT = str.maketrans("!?~\n", "\x00\x00\x00\x00")
+# Level-2: clause delimiters (consumed = removed)
+_CLAUSE_RE = re.compile(
+    r'[，,、：:；;]'
+    r'|'
+    r'(?:——|--)'
+)
+
 
 def _human_delay_for_chunk(chunk: str) -> float:
     """Calculate a human-like delay (in seconds) based on chunk length."""
@@ -107,6 +239,44 @@ def _human_delay_for_chunk(chunk: str) -> float:
     return ms / 1000.0
 
 
+def _split_sentences(text: str) -> list[str]:
+    """Equivalent to _SENTENCE_RE.split(text), with a regex-free ASCII fast path."""
+    if not text.isascii() or "." in text or "\x00" in text:
+        return _SENTENCE_RE.split(text)
+    # Each part is followed by exactly one ender; slice it back in from the original
+    parts: list[str] = []
+    pos = 0
+    for p in text.translate(_ASCII_SENT).split("\x00"):
+        end = pos + len(p) + 1
+        parts.append(text[pos:end])
+        pos = end
+    return parts
+
+
+def _split_grouped(text: str, split: Callable[[str], list[str]], limit: int) -> list[str]:
+    """Split text with `split`, then greedily join consecutive stripped parts so
+    each chunk <= limit (a single part longer than limit stays whole).
+
+    One pass over the split result; empty parts are skipped as they come.
+    """
+    groups: list[str] = []
+    buf = ''
+    for p in split(text):
+        p = p.strip()
+        if not p:
+            continue
+        if not buf:
+            buf = p
+        elif len(buf) + len(p) <= limit:
+            buf += p
+        else:
+            groups.append(buf)
+            buf = p
+    if buf:
+        groups.append(buf)
+    return groups
+
+
 def _chunk_message(text: str, max_chars: int = CHUNK_MAX_CHARS) -> list[str]:
     """Split a long message into natural chunks for sequential sending.
 
@@ -124,44 +294,14 @@ def _chunk_message(text: str, max_chars: int = CHUNK_MAX_CHARS) -> list[str]:
     if not text:
         return []
 
-    # Protect file extensions from being split on the dot (case-insensitive)
-    _PLACEHOLDER = "\x00"
-    _ext_re = re.compile(r'\.(?:md|jpeg|jpg|png|py|js|ts|json|html|css|txt|csv|pdf|zip|gif|svg|mp3|mp4|wav)\b', re.IGNORECASE)
-    text = _ext_re.sub(lambda m: _PLACEHOLDER + m.group(0)[1:], text)
+    # Short single-paragraph reply: nothing would be split
+    if len(text) <= max_chars and "\n\n" not in text:
+        return [text]
 
     # Step 1: Split on \n\n unconditionally
-    paragraphs = re.split(r'\n\n+', text)
+    paragraphs = _PARA_SPLIT_RE.split(text)
     paragraphs = [p.strip() for p in paragraphs if p.strip()]
 
-    # Level-1: sentence-enders (punctuation kept via lookbehind)
-    # English period only splits when NOT preceded by a digit (avoids "1. item" or "v2.0")
-    _sentence_re = re.compile(
-        r'(?<=(?<!\d)[.])'
-        r'|(?<=[!?。！？~\n])'
-    )
-    # Level-2: clause delimiters (consumed = removed)
-    _clause_re = re.compile(
-        r'[，,、：:；;]'
-        r'|'
-        r'(?:——|--)'
-    )
-
-    def _group_parts(parts: list[str], limit: int) -> list[str]:
-        """Greedily group consecutive parts so each chunk <= limit."""
-        groups: list[str] = []
-        buf = ''
-        for p in parts:
-            candidate = (buf + p) if buf else p
-            if len(candidate) <= limit:
-                buf = candidate
-            else:
-                if buf:
-                    groups.append(buf)
-                buf = p
-        if buf:
-            groups.append(buf)
-        return groups
-
     chunks: list[str] = []
     for para in paragraphs:
         if len(para) <= max_chars:
@@ -169,53 +309,60 @@ def _chunk_message(text: str, max_chars: int = CHUNK_MAX_CHARS) -> list[str]:
             continue
 
         # Level-1: split by sentence-enders, then group
-        sentences = [s.strip() for s in _sentence_re.split(para) if s.strip()]
-        grouped = _group_parts(sentences, max_chars)
+        grouped = _split_grouped(para, _split_sentences, max_chars)
 
         for chunk in grouped:
             if len(chunk) <= max_chars:
                 chunks.append(chunk)
             else:
                 # Level-2: clause-level split for overlong single sentence
-                clauses = [c.strip() for c in _clause_re.split(chunk) if c.strip()]
-                grouped2 = _group_parts(clauses, max_chars)
-                chunks.extend(grouped2)
+                chunks.extend(_split_grouped(chunk, _CLAUSE_RE.split, max_chars))
+
+    return [c for c in chunks if c]
 
-    # Restore protected file extensions
-    return [c.replace(_PLACEHOLDER, ".") for c in chunks if c]
+
+async def _no_fetch() -> None:
+    """Placeholder awaitable for a gather slot that needs no API call."""
+    return None
 
 
 def register_tools(
     mcp: Any, config: Config, bot: OneBotClient, ctx: ContextManager
 ) -> None:
     """Register all MCP tools on the FastMCP server instance."""
+    # Shared by every tool handler; lists change rarely next to tool-call rates
+    group_list = _TTLCache(bot.get_group_list)
+    friend_list = _TTLCache(bot.get_friend_list)
+    group_info: dict[str, _TTLCache] = {}  # group_id -> get_group_info cache
+    group_names = _NameIndex(group_list, "group_id", lambda g: g.get("group_name", ""))
+    friend_names = _NameIndex(
+        friend_list, "user_id", lambda f: f.get("nickname", f.get("remark", ""))
+    )
 
     @mcp.tool()
     async def check_status() -> dict:
         """Check QQ login status and NapCat connection status."""
-        try:
-            login_info = await bot.get_login_info()
-        except Exception as e:
+        # Independent round-trips: issue together, failures come back as values
+        login_info, status, groups, all_friends = await asyncio.gather(
+            bot.get_login_info(),
+            bot.get_status(),
+            group_list.get(),
+            friend_list.get(),
+            return_exceptions=True,
+        )
+        if isinstance(login_info, Exception):
             return {
                 "napcat_running": False,
                 "qq_logged_in": False,
-                "error": str(e),
+                "error": str(login_info),
             }
 
         # Online status
         online_status = "unknown"
-        try:
-            status = await bot.get_status()
-            if status.get("online", False):
-                online_status = "online"
-            else:
-                online_status = "offline"
-        except Exception:
-            pass
+        if isinstance(status, dict):
+            online_status = "online" if status.get("online", False) else "offline"
 
-        try:
-            groups = await bot.get_group_list()
-        except Exception:
+        if isinstance(groups, Exception):
             groups = []
 
         monitored_groups = []
@@ -233,7 +380,8 @@ def register_tools(
         # Resolve friend nicknames
         monitored_friends = []
         try:
-            all_friends = await bot.get_friend_list()
+            if isinstance(all_friends, Exception):
+                raise all_friends
             if config.friends is None:
                 # Monitor all friends
                 monitored_friends = [
@@ -269,7 +417,7 @@ def register_tools(
     @mcp.tool()
     async def get_group_list() -> dict:
         """Get the list of QQ groups the bot has joined."""
-        groups = await bot.get_group_list()
+        groups = await group_list.get()
         return {
             "groups": [
                 {
@@ -315,7 +463,12 @@ def register_tools(
         # Add group_name / friend_name if possible
         if target_type == "group":
             try:
-                info = await bot.get_group_info(target)
+                cache = group_info.get(target)
+                if cache is None:
+                    cache = group_info[target] = _TTLCache(
+                        functools.partial(bot.get_group_info, target)
+                    )
+                info = await cache.get()
                 result["group_name"] = info.get("group_name", "")
             except Exception:
                 result["group_name"] = ""
@@ -323,11 +476,7 @@ def register_tools(
             # Enrich friend_name from friend list
             friend_name = ""
             try:
-                friends = await bot.get_friend_list()
-                for f in friends:
-                    if str(f.get("user_id", "")) == target:
-                        friend_name = f.get("nickname", f.get("remark", ""))
-                        break
+                friend_name = (await friend_names.get()).get(target, "")
             except Exception:
                 pass
             result["friend_name"] = friend_name
@@ -354,62 +503,57 @@ def register_tools(
         """
         limit = max(1, min(limit, 200))
 
-        # Classify targets
-        group_ids: list[str] = []
+        # Classify targets and apply the whitelist in one pass
+        # (target, target_type, error or None)
+        classified: list[tuple[str, str, str | None]] = []
+        group_ids: list[str] = []  # monitored only; decide which lists to fetch
         friend_ids: list[str] = []
         for t in targets:
             tt = t.get("target_type", "group")
             tid = str(t.get("target", ""))
+            error = None
             if tt == "group":
-                group_ids.append(tid)
+                if config.is_group_monitored(tid):
+                    group_ids.append(tid)
+                else:
+                    error = f"Group {tid} is not monitored"
             elif tt == "private":
-                friend_ids.append(tid)
+                if config.is_friend_monitored(tid):
+                    friend_ids.append(tid)
+                else:
+                    error = f"User {tid} is not in friends whitelist"
+            else:
+                error = f"Invalid target_type: {tt}"
+            classified.append((tid, tt, error))
+
+        # Batch fetch names — at most 2 API calls total, issued together
+        group_name_map, friend_name_map = await asyncio.gather(
+            group_names.get() if group_ids else _no_fetch(),
+            friend_names.get() if friend_ids else _no_fetch(),
+            return_exceptions=True,
+        )
 
-        # Batch fetch names — at most 2 API calls total
-        group_name_map: dict[str, str] = {}
-        if group_ids:
-            try:
-                all_groups = await bot.get_group_list()
-                group_name_map = {
-                    str(g.get("group_id", "")): g.get("group_name", "")
-                    for g in all_groups
-                }
-            except Exception as e:
-                logger.warning("batch: failed to get group list: %s", e)
+        if isinstance(group_name_map, Exception):
+            logger.warning("batch: failed to get group list: %s", group_name_map)
+        if not isinstance(group_name_map, dict):
+            group_name_map = {}
 
-        friend_name_map: dict[str, str] = {}
-        if friend_ids:
-            try:
-                all_friends = await bot.get_friend_list()
-                friend_name_map = {
-                    str(f.get("user_id", "")): f.get("nickname", f.get("remark", ""))
-                    for f in all_friends
-                }
-            except Exception as e:
-                logger.warning("batch: failed to get friend list: %s", e)
+        if isinstance(friend_name_map, Exception):
+            logger.warning("batch: failed to get friend list: %s", friend_name_map)
+        if not isinstance(friend_name_map, dict):
+            friend_name_map = {}
 
         # Build results — pure memory reads
+        get_context = ctx.get_context
         results: list[dict] = []
-        for t in targets:
-            target = str(t.get("target", ""))
-            target_type = t.get("target_type", "group")
-
-            # Whitelist check
-            if target_type == "group" and not config.is_group_monitored(target):
+        for target, target_type, error in classified:
+            if error is not None:
                 results.append({"target": target, "target_type": target_type,
-                                "error": f"Group {target} is not monitored"})
-                continue
-            if target_type == "private" and not config.is_friend_monitored(target):
-                results.append({"target": target, "target_type": target_type,
-                                "error": f"User {target} is not in friends whitelist"})
-                continue
-            if target_type not in ("group", "private"):
-                results.append({"target": target, "target_type": target_type,
-                                "error": f"Invalid target_type: {target_type}"})
+                                "error": error})
                 continue
 
             # Read from memory buffer
-            result = ctx.get_context(target, target_type, limit)
+            result = get_context(target, target_type, limit)
 
             # Attach name from pre-fetched map (0 API calls)
             if target_type == "group":
@@ -466,17 +610,10 @@ def register_tools(
                 "error": "你发送了沉默，沉默不该调用 MCP 接口。",
             }
 
-        # Rate limit
-        now = time.time()
+        # Rate limit (waits for this target's next slot)
         key = f"{target_type}:{target}"
-        last = _last_send.get(key, 0)
-        if now - last < RATE_LIMIT_SECONDS:
-            wait = RATE_LIMIT_SECONDS - (now - last)
-            return {
-                "success": False,
-                "error": f"Rate limited. Try again in {wait:.1f}s",
-            }
-        _last_send[key] = now
+        bucket = _send_bucket(key)
+        await bucket.acquire()
 
         # Duplicate detection (before chunking)
         dup_warning = _check_duplicate(key, content)
@@ -505,19 +642,26 @@ def register_tools(
         if not chunks:
             return {"success": False, "error": "Empty message content"}
 
+        # Strip trailing periods for natural chat style; delays are drawn up
+        # front so the send loop only awaits (none after the last chunk)
+        texts = [c.rstrip("。.") for c in chunks]
+        delays = [_human_delay_for_chunk(c) for c in texts[:-1]]
+
         sent_ids: list[str] = []
         first_reply_to = reply_to  # Only first chunk is a reply
         t0 = time.time()  # record baseline for incremental message snapshot
+        # Timestamps are derived from t0 plus the delays slept, not re-read per chunk
+        start_dt = datetime.fromtimestamp(t0, CST)
+        elapsed = 0.0
 
         try:
-            for i, chunk_text in enumerate(chunks):
-                # Strip trailing periods for natural chat style
-                chunk_text = chunk_text.rstrip("。.")
+            for i, chunk_text in enumerate(texts):
                 if not chunk_text:
                     continue
                 msg = _text_to_segments(chunk_text)
                 rto = first_reply_to if i == 0 else None
 
+                send_started = time.monotonic()
                 if target_type == "group":
                     result = await bot.send_group_msg(target, msg, reply_to=rto)
                 else:
@@ -531,19 +675,20 @@ def register_tools(
                     sender_id=config.qq,
                     sender_name="bot",
                     content=chunk_text,
-                    timestamp=datetime.now(CST).isoformat(),
+                    timestamp=(start_dt + timedelta(seconds=elapsed)).isoformat(),
                     message_id=msg_id,
                     is_self=True,
                 )
                 ctx.add_message(target, target_type, bot_msg)
 
-                # Human-like delay based on chunk length (not after last)
-                if i < len(chunks) - 1:
-                    delay = _human_delay_for_chunk(chunk_text)
-                    await asyncio.sleep(delay)
+                # Human-like delay based on chunk length (not after last),
+                # counted from the send start so the round-trip is absorbed
+                if i < len(delays):
+                    await asyncio.sleep(delays[i] - (time.monotonic() - send_started))
+                    elapsed += delays[i]
 
         except Exception as e:
-            _last_send[key] = last  # rollback rate limit on failure
+            bucket.refund()  # rollback rate limit on failure
             if sent_ids:
                 return {
                     "success": False,
@@ -554,16 +699,13 @@ def register_tools(
 
         # Brief wait for WebSocket to deliver group reactions
         await asyncio.sleep(0.5)
+        elapsed += 0.5
 
         # Snapshot: all messages since this send_message started (incremental)
-        recent_msgs = ctx.get_messages_since(target, target_type, t0)
-        recent_lines: list[str] = []
-        for m in recent_msgs:
-            if m.is_self:
-                tag = "[bot(self)]"
-            else:
-                tag = f"[{m.sender_name}]"
-            recent_lines.append(f"{tag} {m.content}")
+        recent_lines = [
+            f"[bot(self)] {m.content}" if m.is_self else f"[{m.sender_name}] {m.content}"
+            for m in ctx.get_messages_since(target, target_type, t0)
+        ]
 
         return {
             "success": True,
@@ -571,7 +713,7 @@ def register_tools(
             "chunks": len(chunks),
             "target": target,
             "target_type": target_type,
-            "timestamp": datetime.now(CST).isoformat(),
+            "timestamp": (start_dt + timedelta(seconds=elapsed)).isoformat(),
             "recent_messages": recent_lines,
         }
 
@@ -603,17 +745,10 @@ def register_tools(
         else:
             return {"success": False, "error": f"Invalid target_type: {target_type}"}
 
-        # Rate limit
-        now = time.time()
+        # Rate limit (waits for this target's next slot)
         key = f"{target_type}:{target}"
-        last = _last_send.get(key, 0)
-        if now - last < RATE_LIMIT_SECONDS:
-            wait = RATE_LIMIT_SECONDS - (now - last)
-            return {
-                "success": False,
-                "error": f"Rate limited. Try again in {wait:.1f}s",
-            }
-        _last_send[key] = now
+        bucket = _send_bucket(key)
+        await bucket.acquire()
 
         msg = [{"type": "image", "data": {"file": f"base64://{image}"}}]
 
@@ -623,17 +758,18 @@ def register_tools(
             else:
                 result = await bot.send_private_msg(target, msg, reply_to=reply_to)
         except Exception as e:
-            _last_send[key] = last  # rollback rate limit on failure
+            bucket.refund()  # rollback rate limit on failure
             return {"success": False, "error": str(e)}
 
         msg_id = str(result.get("message_id", ""))
+        timestamp = datetime.now(CST).isoformat()
 
         # Write bot's own message into buffer
         bot_msg = Message(
             sender_id=config.qq,
             sender_name="bot",
             content="[图片]",
-            timestamp=datetime.now(CST).isoformat(),
+            timestamp=timestamp,
             message_id=msg_id,
             is_self=True,
         )
@@ -644,7 +780,7 @@ def register_tools(
             "message_id": msg_id,
             "target": target,
             "target_type": target_type,
-            "timestamp": datetime.now(CST).isoformat(),
+            "timestamp": timestamp,
         }
 
     @mcp.tool()
@@ -673,49 +809,50 @@ def register_tools(
             return {"error": f"Invalid target_type: {target_type}"}
 
         buf_key = ctx._buffer_key(target_type, target)
-        buf = ctx._buffers.get(buf_key)
-        if buf is None or len(buf.messages) == 0:
-            return {
-                "success": True,
-                "compressed": 0,
-                "message": "No messages to compress",
-                "compressed_summary": buf.compressed_summary if buf else None,
-            }
+        lock = ctx.compress_lock(buf_key)
+        if lock.locked():
+            # Another call is already summarising this buffer; don't pay for a second LLM run
+            return {"error": f"Compression already in progress for {target_type} {target}"}
+
+        async with lock:
+            buf = ctx._buffers.get(buf_key)
+            if buf is None or len(buf.messages) == 0:
+                return {
+                    "success": True,
+                    "compressed": 0,
+                    "message": "No messages to compress",
+                    "compressed_summary": buf.compressed_summary if buf else None,
+                }
 
-        # Extract all messages
-        all_msgs = list(buf.messages)
-        buf.messages.clear()
-        buf._compress_pending = False
-        buf._compress_all_pending = False
-        buf._msg_since_compress = 0
+            # Extract all messages
+            all_msgs = buf.take_all()
 
-        # Try LLM compression, fall back to rule-based
-        try:
-            summary = await _llm_compress(ctx_mcp, all_msgs)
-            method = "llm"
-        except Exception as e:
-            logger.warning("LLM compression failed, using rule-based: %s", e)
-            summary = _rule_based_compress(all_msgs)
-            method = "rule-based"
+            # Try LLM compression, fall back to rule-based
+            try:
+                summary = await _llm_compress(ctx_mcp, all_msgs)
+                method = "llm"
+            except Exception as e:
+                logger.warning("LLM compression failed, using rule-based: %s", e)
+                summary = _rule_based_compress(all_msgs)
+                method = "rule-based"
 
-        buf.apply_summary(summary)
-        logger.info("%s compressed %d messages for %s", method, len(all_msgs), buf_key)
+            buf.apply_summary(summary)
+            logger.info("%s compressed %d messages for %s", method, len(all_msgs), buf_key)
 
-        return {
-            "success": True,
-            "compressed": len(all_msgs),
-            "method": method,
-            "compressed_summary": buf.compressed_summary,
-        }
+            return {
+                "success": True,
+                "compressed": len(all_msgs),
+                "method": method,
+                "compressed_summary": buf.compressed_summary,
+            }
 
 
 async def _llm_compress(ctx_mcp: Context, messages: list) -> str:
     """Use the client's LLM (via MCP sampling) to compress messages into a summary."""
     # Format messages for the LLM
-    lines = []
-    for m in messages:
-        lines.append(f"[{m.timestamp}] {m.sender_name}: {m.content}")
-    chat_log = "\n".join(lines)
+    chat_log = "\n".join(
+        [f"[{m.timestamp}] {m.sender_name}: {m.content}" for m in messages]
+    )
 
     result = await ctx_mcp.session.create_message(
         messages=[
@@ -755,7 +892,8 @@ def _rule_based_compress(messages: list) -> str:
     """Fallback: rule-based compression when LLM is unavailable."""
     lines = []
     for m in messages:
-        content = m.content[:80] + "..." if len(m.content) > 80 else m.content
+        c = m.content
+        content = c[:80] + "..." if len(c) > 80 else c
         lines.append(f"{m.sender_name}: {content}")
     summary_block = " | ".join(lines)
     ts_range = f"[{messages[0].timestamp} ~ {messages[-1].timestamp}]"
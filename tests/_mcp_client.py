@@ -0,0 +1,143 @@
+"""Minimal stdio JSON-RPC (NDJSON) client shared by the MCP test scripts."""
+
+import asyncio
+import contextlib
+import itertools
+import json
+import sys
+
+try:
+    # optional (`fast` extra): much faster on multi-MB base64 image responses
+    from orjson import (
+        OPT_APPEND_NEWLINE, OPT_INDENT_2, dumps as _orjson_dumps, loads as json_loads,
+    )
+
+    def _encode_line(msg) -> bytes:
+        return _orjson_dumps(msg, option=OPT_APPEND_NEWLINE)  # no extra concat copy
+
+    def print_json(data) -> None:
+        """Pretty-print data as indented JSON."""
+        # json.dumps(indent=...) runs the pure-Python encoder; write orjson's bytes as-is
+        sys.stdout.flush()  # keep ordering with earlier print() output
+        sys.stdout.buffer.write(_orjson_dumps(data, option=OPT_INDENT_2 | OPT_APPEND_NEWLINE))
+except ImportError:
+    json_loads = json.loads
+
+    def _encode_line(msg) -> bytes:
+        return (json.dumps(msg, ensure_ascii=False) + "\n").encode()  # raw UTF-8, not \uXXXX
+
+    def print_json(data) -> None:
+        """Pretty-print data as indented JSON."""
+        print(json.dumps(data, indent=2, ensure_ascii=False))
+
+
+class ServerClosedError(RuntimeError):
+    """The server closed its stdout (exited) before answering."""
+
+
+def print_notification(msg: dict) -> None:
+    print(f"  [notification] {msg.get('method', '?')}")
+
+
+class MCPClient:
+    """Talks to an MCP server subprocess over its stdin/stdout pipes.
+
+    A single reader task routes each response to the call() waiting on its
+    id, so calls may be in flight concurrently. Anything carrying a
+    "method" (notifications, server-initiated requests) goes to
+    `on_notification`; non-JSON stdout lines are reported and skipped.
+
+    Once the reader stops, pending and later calls raise its cause:
+    ServerClosedError on EOF, otherwise the exception that ended it.
+    """
+
+    def __init__(self, proc, on_notification=print_notification):
+        self.proc = proc
+        self.on_notification = on_notification
+        self._ids = itertools.count(1)
+        self._pending: dict[int, asyncio.Future] = {}
+        self._error: BaseException | None = None  # set once the reader stops
+        self._reader_task = asyncio.create_task(self._reader_loop())
+
+    async def call(self, method: str, params: dict | None = None, timeout: float = 10) -> dict:
+        """Send a request and return the raw response message (result or error)."""
+        if self._error is not None:
+            raise self._error
+        msg_id = next(self._ids)
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[msg_id] = fut
+        msg = {"jsonrpc": "2.0", "id": msg_id, "method": method}
+        if params is not None:
+            msg["params"] = params
+        try:
+            await self._send(msg)
+            async with asyncio.timeout(timeout):
+                return await fut
+        except TimeoutError:
+            raise TimeoutError(f"No response to {method}") from None
+        finally:
+            self._pending.pop(msg_id, None)
+
+    async def call_tool(self, name: str, arguments: dict | None = None, timeout: float = 10) -> dict:
+        """tools/call shortcut."""
+        return await self.call(
+            "tools/call", {"name": name, "arguments": arguments or {}}, timeout=timeout
+        )
+
+    async def notify(self, method: str, params: dict | None = None) -> None:
+        msg = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            msg["params"] = params
+        await self._send(msg)
+
+    async def close(self) -> None:
+        """Stop reading and terminate the server."""
+        self._reader_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._reader_task
+        if self.proc.returncode is None:
+            self.proc.terminate()
+        # Not wait(): it only returns at pipe EOF, and output the reader left
+        # unread (e.g. after an over-limit line) would keep the pipe open
+        await self.proc.communicate()
+
+    async def _send(self, msg: dict) -> None:
+        self.proc.stdin.write(_encode_line(msg))
+        await self.proc.stdin.drain()
+
+    async def _reader_loop(self) -> None:
+        error: BaseException = ServerClosedError("Server closed stdout")
+        try:
+            while line := await self.proc.stdout.readline():
+                try:
+                    msg = json_loads(line)
+                except ValueError:  # json / orjson JSONDecodeError
+                    msg = None
+                if not isinstance(msg, dict):
+                    # stray print / banner on stdout: not JSON-RPC, report and skip
+                    print(f"  [non-JSON stdout] {line[:200].decode(errors='replace').rstrip()}")
+                    continue
+                if "method" in msg:
+                    self.on_notification(msg)
+                    continue
+                fut = self._pending.get(msg.get("id"))
+                if fut is not None and not fut.done():
+                    fut.set_result(msg)
+        except asyncio.CancelledError:
+            error = RuntimeError("Client closed")
+            raise
+        except Exception as e:  # e.g. line over the StreamReader limit
+            error = e
+        finally:
+            # Reader is done: fail everything still waiting with the actual cause
+            self._error = error
+            for fut in self._pending.values():
+                if not fut.done():
+                    fut.set_exception(error)
+
+
+def tool_texts(resp: dict) -> list[str]:
+    """Text blocks of a tools/call response."""
+    return [
+        c["text"] for c in resp.get("result", {}).get("content", []) if c["type"] == "text"
+    ]
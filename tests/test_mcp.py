@@ -2,7 +2,32 @@
 
 import asyncio
 import json
-import sys
+
+from _mcp_client import MCPClient, ServerClosedError, json_loads, print_json, tool_texts
+
+GROUP = {"target": "1059558644", "target_type": "group"}
+
+# send_message chunking test payload
+LONG_CONTENT = (
+    "这是一条测试消息，用来验证消息自动拆分功能。\n\n"
+    "第一段：OpenClaw 的消息拆分机制非常优雅。它通过 EmbeddedBlockChunker 将长文本按段落、换行、句号等自然边界拆分成多条消息，"
+    "每条之间加入 800-2500ms 的随机延迟，模拟真人打字节奏。这种方式让 AI 的回复看起来更加自然，而不是一次性发出一大坨文字。\n\n"
+    "第二段：我们的 QQ MCP Server 也实现了类似的机制。当 AI 回复的内容超过 500 字符时，"
+    "会自动按照段落边界 > 换行符 > 句号 > 空格的优先级进行拆分。每条消息之间会有随机延迟，让对话更像真人。\n\n"
+    "第三段：这条消息本身就是一个测试用例。如果你看到这条消息被拆成了多条，说明拆分功能工作正常！✅"
+)
+
+
+def _print_notification(msg):
+    print(f"  [notification] {msg.get('method', '?')}: {json.dumps(msg.get('params', {}), ensure_ascii=False)}")
+
+
+def _print_json_texts(resp):
+    for text in tool_texts(resp):
+        try:
+            print_json(json_loads(text))
+        except json.JSONDecodeError:
+            print(text)
 
 
 async def main():
@@ -11,90 +36,63 @@ async def main():
         stdin=asyncio.subprocess.PIPE,
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
-        limit=10 * 1024 * 1024,  # 10 MB buffer for base64 image responses
+        limit=10 * 1024 * 1024,  # max line size, not preallocated; context dumps outgrow the 64 KB default
     )
-
-    # Give the server a moment to start
-    await asyncio.sleep(1)
-
-    # Check if process died
-    if proc.returncode is not None:
+    client = MCPClient(proc, on_notification=_print_notification)
+
+    # MCP initialize. No startup sleep: stdin buffers the request until the
+    # server reads it, and a server that dies on startup shows up as closed stdout
+    try:
+        resp = await client.call(
+            "initialize",
+            {
+                "protocolVersion": "2024-11-05",
+                "capabilities": {},
+                "clientInfo": {"name": "test", "version": "0.1.0"},
+            },
+            timeout=5,
+        )
+    except ServerClosedError:
+        await proc.wait()
         stderr = await proc.stderr.read()
         print(f"Server exited with code {proc.returncode}")
         print(f"stderr: {stderr.decode()}")
         return
+    print("Init response:")
+    print_json(resp)
 
-    # MCP initialize
-    init_msg = {
-        "jsonrpc": "2.0",
-        "id": 1,
-        "method": "initialize",
-        "params": {
-            "protocolVersion": "2024-11-05",
-            "capabilities": {},
-            "clientInfo": {"name": "test", "version": "0.1.0"},
-        },
-    }
-    await send(proc, init_msg)
-    resp = await recv_skip_notifications(proc, timeout=5)
-    print("Init response:", json.dumps(resp, indent=2, ensure_ascii=False))
-
-    # Send initialized notification
-    await send(proc, {"jsonrpc": "2.0", "method": "notifications/initialized"})
-    await asyncio.sleep(0.3)
-
-    # List tools
-    await send(proc, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
-    resp = await recv_skip_notifications(proc, timeout=5)
-    tools = [t["name"] for t in resp.get("result", {}).get("tools", [])]
-    print(f"\nTools: {tools}")
+    # Send initialized notification. No pause needed: the server handles stdin
+    # in order, so it is initialized before it reads the next request
+    await client.notify("notifications/initialized")
 
-    # Call check_status
-    await send(
-        proc,
-        {
-            "jsonrpc": "2.0",
-            "id": 3,
-            "method": "tools/call",
-            "params": {"name": "check_status", "arguments": {}},
-        },
+    # List tools and call check_status; independent, so both are in flight at once
+    tools_resp, resp = await asyncio.gather(
+        client.call("tools/list", timeout=5),
+        client.call_tool("check_status", timeout=10),
     )
-    resp = await recv_skip_notifications(proc, timeout=10)
+    tools = [t["name"] for t in tools_resp.get("result", {}).get("tools", [])]
+    print(f"\nTools: {tools}")
+
     print("\ncheck_status result:")
-    for c in resp.get("result", {}).get("content", []):
-        if c["type"] == "text":
-            data = json.loads(c["text"])
-            print(json.dumps(data, indent=2, ensure_ascii=False))
-    # Wait a few seconds for WS listener to collect some messages
-    print("\nWaiting 5s for WebSocket messages to arrive...")
-    await asyncio.sleep(15)
-
-    # Call get_recent_context on a test group
-    await send(
-        proc,
-        {
-            "jsonrpc": "2.0",
-            "id": 4,
-            "method": "tools/call",
-            "params": {
-                "name": "get_recent_context",
-                "arguments": {"target": "1059558644", "target_type": "group", "limit": 5},
-            },
-        },
-    )
-    resp = await recv_skip_notifications(proc, timeout=30)
+    _print_json_texts(resp)
+
+    # Wait for WS listener / backfill to have some messages; the last poll
+    # is the result shown below
+    print("\nWaiting up to 15s for messages to arrive...")
+    resp = await _wait_for_messages(client, limit=5, max_wait=15)
+
     print("\nget_recent_context result:")
     for c in resp.get("result", {}).get("content", []):
         if c["type"] == "text":
             text = c["text"]
             try:
-                data = json.loads(text)
+                data = json_loads(text)
                 # Truncate base64 image data for readability
                 for msg in data.get("messages", []):
                     for img in msg.get("images", []):
                         if "data" in img and len(img["data"]) > 40:
                             img["data"] = img["data"][:40] + f"... ({len(img['data'])} chars)"
-                print(json.dumps(data, indent=2, ensure_ascii=False))
+                print_json(data)
             except json.JSONDecodeError:
                 # Image label text (not JSON)
                 print(f"  {text}")
@@ -107,69 +105,50 @@ async def main():
                 print(f"  [ImageContent: {mime}, {len(data_str)} chars base64]")
 
     # Test send_message with long content (chunking test)
-    long_content = (
-        "这是一条测试消息，用来验证消息自动拆分功能。\n\n"
-        "第一段：OpenClaw 的消息拆分机制非常优雅。它通过 EmbeddedBlockChunker 将长文本按段落、换行、句号等自然边界拆分成多条消息，"
-        "每条之间加入 800-2500ms 的随机延迟，模拟真人打字节奏。这种方式让 AI 的回复看起来更加自然，而不是一次性发出一大坨文字。\n\n"
-        "第二段：我们的 QQ MCP Server 也实现了类似的机制。当 AI 回复的内容超过 500 字符时，"
-        "会自动按照段落边界 > 换行符 > 句号 > 空格的优先级进行拆分。每条消息之间会有随机延迟，让对话更像真人。\n\n"
-        "第三段：这条消息本身就是一个测试用例。如果你看到这条消息被拆成了多条，说明拆分功能工作正常！✅"
-    )
     print("\n--- Testing send_message (chunking) ---")
-    print(f"Content length: {len(long_content)} chars")
-    await send(
-        proc,
-        {
-            "jsonrpc": "2.0",
-            "id": 5,
-            "method": "tools/call",
-            "params": {
-                "name": "send_message",
-                "arguments": {"target": "1059558644", "target_type": "group", "content": long_content},
-            },
-        },
-    )
-    resp = await recv_skip_notifications(proc, timeout=120)
+    print(f"Content length: {len(LONG_CONTENT)} chars")
+    resp = await client.call_tool("send_message", {**GROUP, "content": LONG_CONTENT}, timeout=120)
     print("send_message result:")
-    for c in resp.get("result", {}).get("content", []):
-        if c["type"] == "text":
-            try:
-                print(json.dumps(json.loads(c["text"]), indent=2, ensure_ascii=False))
-            except json.JSONDecodeError:
-                print(c["text"])
+    _print_json_texts(resp)
 
-    proc.terminate()
+    await client.close()
     print("\nDone!")
 
 
-async def send(proc, msg):
-    """Send a JSON-RPC message as a single line (NDJSON)."""
-    line = json.dumps(msg) + "\n"
-    proc.stdin.write(line.encode())
-    await proc.stdin.drain()
-
-
-async def recv(proc, timeout=5):
-    """Read one line of NDJSON from stdout."""
-    line = await asyncio.wait_for(proc.stdout.readline(), timeout=timeout)
-    if not line:
-        raise RuntimeError("Server closed stdout")
-    return json.loads(line)
+async def _wait_for_messages(client, limit, max_wait):
+    """Poll get_recent_context until it returns `limit` messages or the count
+    stops changing between two polls (0.1s delay growing to 1s), at most `max_wait`s.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_wait
+    prev = -1
+    delay = 0.1
+    while True:
+        resp = await client.call_tool("get_recent_context", {**GROUP, "limit": limit}, timeout=30)
+        n = _message_count(resp)
+        if n >= limit or (n == prev and n > 0) or loop.time() >= deadline:
+            return resp
+        prev = n
+        await asyncio.sleep(min(delay, max(0.0, deadline - loop.time())))
+        delay = min(delay * 1.5, 1.0)
 
 
-async def recv_skip_notifications(proc, timeout=5):
-    """Read lines, skipping server notifications, until we get a response (has 'id')."""
-    deadline = asyncio.get_event_loop().time() + timeout
-    while True:
-        remaining = deadline - asyncio.get_event_loop().time()
-        if remaining <= 0:
-            raise TimeoutError("No response received")
-        msg = await recv(proc, timeout=remaining)
-        if "id" in msg:
-            return msg
-        # It's a notification, skip it
-        print(f"  [notification] {msg.get('method', '?')}: {json.dumps(msg.get('params', {}), ensure_ascii=False)}")
+def _message_count(resp):
+    """Number of messages in a get_recent_context tools/call response."""
+    for text in tool_texts(resp):
+        try:
+            return len(json_loads(text).get("messages", []))
+        except (json.JSONDecodeError, AttributeError):
+            pass
+    return 0
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        import uvloop  # optional (`fast` extra), same loop the server runs on
+    except ImportError:
+        asyncio.run(main())
+    else:
+        # loop_factory, not an event-loop policy (deprecated in 3.14)
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            runner.run(main())